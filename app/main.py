@@ -1,10 +1,12 @@
 import logging
 import asyncio
+import orjson
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from .config import settings
+from starlette.routing import Mount
+from fastapi.responses import JSONResponse, ORJSONResponse, Response, StreamingResponse
+from .config import Settings, settings, get_settings
 from .models import (
     ChatRequest, ChatResponse, GitHubIngestRequest, GitHubIngestResponse,
     DocumentSearchRequest, DocumentSearchResponse
@@ -12,7 +14,7 @@ from .models import (
 from .services.mongodb_service import mongodb_service
 from .services.github_service import github_service
 from .services.llm_service import llm_service
-from .mcp_server import start_mcp_server, mcp
+from .mcp_server import get_mcp
 
 logging.basicConfig(
     level=getattr(logging, settings.log_level.upper()),
@@ -24,30 +26,35 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     logger.info("Starting ChatGTG application...")
     
-    try:
-        await mongodb_service.connect()
-        logger.info("MongoDB Atlas connection established")
-    except Exception as e:
-        logger.error(f"Failed to connect to MongoDB Atlas: {str(e)}")
+    mcp_app = get_mcp().http_app(path="/")
+    mcp_mount = Mount("/mcp", app=mcp_app)
+    app.router.routes.append(mcp_mount)
     
     try:
-        await start_mcp_server()
-        logger.info("MCP server initialized")
-    except Exception as e:
-        logger.error(f"Failed to initialize MCP server: {str(e)}")
-    
-    logger.info("ChatGTG application startup complete")
-    
-    yield
-    
-    logger.info("Shutting down ChatGTG application...")
-    await mongodb_service.disconnect()
-    logger.info("ChatGTG application shutdown complete")
+        async with mcp_app.lifespan(mcp_app):
+            try:
+                await mongodb_service.connect()
+                logger.info("MongoDB Atlas connection established")
+            except Exception as e:
+                logger.error(f"Failed to connect to MongoDB Atlas: {str(e)}")
+            
+            logger.info(f"MCP server initialized: {settings.mcp_server_name} v{settings.mcp_server_version}")
+            logger.info("ChatGTG application startup complete")
+            
+            yield
+            
+            logger.info("Shutting down ChatGTG application...")
+            await llm_service.aclose()
+            await mongodb_service.disconnect()
+            logger.info("ChatGTG application shutdown complete")
+    finally:
+        app.router.routes.remove(mcp_mount)
 
 app = FastAPI(
     title="ChatGTG API",
     description="ChatGTG - AI Assistant with MongoDB Atlas Knowledge Base and MCP Server",
     version=settings.mcp_server_version,
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -60,19 +67,56 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
+_HEALTHZ_BYTES = {
+    connected: orjson.dumps({
+        "status": "ok",
+        "service": "ChatGTG",
+        "version": settings.mcp_server_version,
+        "mongodb_connected": connected,
+        "mcp_server": settings.mcp_server_name
+    })
+    for connected in (True, False)
+}
+
+_MCP_INFO_BYTES = orjson.dumps({
+    "mcp_server_name": settings.mcp_server_name,
+    "mcp_server_version": settings.mcp_server_version,
+    "tools": [
+        {
+            "name": "search_documents",
+            "description": "Search documents by text query"
+        },
+        {
+            "name": "get_all_documents", 
+            "description": "Get all documents with limit"
+        },
+        {
+            "name": "get_document_count",
+            "description": "Get total document count"
+        },
+        {
+            "name": "search_documents_by_metadata",
+            "description": "Search by metadata filters"
+        }
+    ],
+    "resources": [
+        {
+            "uri": "server://info",
+            "description": "Get server information"
+        },
+        {
+            "uri": "database://status", 
+            "description": "Get database status"
+        }
+    ]
+})
+
 @app.get("/healthz")
 async def healthz():
     """Health check endpoint"""
     try:
         mongo_status = await mongodb_service.is_connected()
-        
-        return {
-            "status": "ok",
-            "service": "ChatGTG",
-            "version": settings.mcp_server_version,
-            "mongodb_connected": mongo_status,
-            "mcp_server": settings.mcp_server_name
-        }
+        return Response(content=_HEALTHZ_BYTES[mongo_status], media_type="application/json")
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return JSONResponse(
@@ -88,9 +132,13 @@ async def chat_completion(request: ChatRequest):
     """
     Chat completion endpoint that uses the  LLM with MCP tool calling support.
     The LLM can call MCP tools to search and retrieve documents from MongoDB Atlas.
+    When stream is true the response is sent as server-sent events.
     """
     try:
         logger.info(f"Processing chat request with {len(request.messages)} messages")
+        if request.stream:
+            return StreamingResponse(llm_service.chat_completion_stream(request), media_type="text/event-stream")
+        
         response = await llm_service.chat_completion(request)
         logger.info("Chat completion successful")
         return response
@@ -108,6 +156,7 @@ async def ingest_github_repository(request: GitHubIngestRequest, background_task
         logger.info(f"Starting GitHub ingestion for repository: {request.repository_url}")
         
         response = await github_service.ingest_repository(request)
+        llm_service.response_cache.clear()
         
         logger.info(f"GitHub ingestion completed: {response.status}")
         return response
@@ -140,14 +189,14 @@ async def search_documents(request: DocumentSearchRequest):
         raise HTTPException(status_code=500, detail=f"Document search failed: {str(e)}")
 
 @app.get("/documents/count")
-async def get_document_count():
+async def get_document_count(app_settings: Settings = Depends(get_settings)):
     """Get the total count of documents in the knowledge base"""
     try:
         count = await mongodb_service.get_document_count()
         return {
             "total_documents": count,
-            "database": settings.mongodb_database,
-            "collection": settings.mongodb_collection
+            "database": app_settings.mongodb_database,
+            "collection": app_settings.mongodb_collection
         }
     except Exception as e:
         logger.error(f"Failed to get document count: {str(e)}")
@@ -156,37 +205,4 @@ async def get_document_count():
 @app.get("/mcp/info")
 async def get_mcp_info():
     """Get information about the MCP server"""
-    return {
-        "mcp_server_name": settings.mcp_server_name,
-        "mcp_server_version": settings.mcp_server_version,
-        "tools": [
-            {
-                "name": "search_documents",
-                "description": "Search documents by text query"
-            },
-            {
-                "name": "get_all_documents", 
-                "description": "Get all documents with limit"
-            },
-            {
-                "name": "get_document_count",
-                "description": "Get total document count"
-            },
-            {
-                "name": "search_documents_by_metadata",
-                "description": "Search by metadata filters"
-            }
-        ],
-        "resources": [
-            {
-                "uri": "server://info",
-                "description": "Get server information"
-            },
-            {
-                "uri": "database://status", 
-                "description": "Get database status"
-            }
-        ]
-    }
-
-app.mount("/mcp", mcp)
+    return Response(content=_MCP_INFO_BYTES, media_type="application/json")
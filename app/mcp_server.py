@@ -1,16 +1,33 @@
 import asyncio
 import logging
+import orjson
+from functools import lru_cache
 from typing import Any, Dict, List, Optional
 from fastmcp import FastMCP
+from .models import Document, ToolDocument
 from .services.mongodb_service import mongodb_service
 from .config import settings
 
 logger = logging.getLogger(__name__)
 
-mcp = FastMCP(settings.mcp_server_name)
+# Search tools return truncated content; one extra character is fetched so truncation stays detectable
+TOOL_CONTENT_LIMIT = 500
 
-@mcp.tool()
-async def search_documents(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+def _format_docs(documents: List[Document], truncate: Optional[int] = None, include_score: bool = True) -> List[ToolDocument]:
+    """Convert documents into the payload shared by all document-returning tools"""
+    formatted = []
+    for doc in documents:
+        tool_doc = doc.to_tool_dict(truncate=truncate)
+        if include_score:
+            tool_doc["relevance_score"] = doc.search_score if doc.search_score is not None else 1
+        formatted.append(tool_doc)
+    return formatted
+
+def _serialize_tool_result(data: Any) -> str:
+    """Encode tool results with orjson instead of FastMCP's default pydantic serializer"""
+    return orjson.dumps(data, default=str).decode()
+
+async def search_documents(query: str, limit: int = 10) -> List[ToolDocument]:
     """
     Search for documents in the MongoDB Atlas knowledge base using enhanced relevance-based search.
     
@@ -22,24 +39,13 @@ async def search_documents(query: str, limit: int = 10) -> List[Dict[str, Any]]:
         List of documents matching the search query, ranked by relevance
     """
     try:
-        documents = await mongodb_service.search_documents(query, limit)
-        return [
-            {
-                "id": doc.id,
-                "content": doc.content[:500] + "..." if len(doc.content) > 500 else doc.content,  # Truncate long content
-                "metadata": doc.metadata,
-                "relevance_score": getattr(doc, '_search_score', 1),
-                "created_at": doc.created_at.isoformat() if doc.created_at else None,
-                "updated_at": doc.updated_at.isoformat() if doc.updated_at else None
-            }
-            for doc in documents
-        ]
+        documents = await mongodb_service.search_documents(query, limit, content_limit=TOOL_CONTENT_LIMIT + 1)
+        return _format_docs(documents, truncate=TOOL_CONTENT_LIMIT)
     except Exception as e:
         logger.error(f"Error searching documents: {str(e)}")
         return []
 
-@mcp.tool()
-async def get_all_documents(limit: int = 20) -> List[Dict[str, Any]]:
+async def get_all_documents(limit: int = 20) -> List[ToolDocument]:
     """
     Get all documents from the MongoDB Atlas knowledge base.
     
@@ -51,21 +57,11 @@ async def get_all_documents(limit: int = 20) -> List[Dict[str, Any]]:
     """
     try:
         documents = await mongodb_service.get_all_documents(limit)
-        return [
-            {
-                "id": doc.id,
-                "content": doc.content,
-                "metadata": doc.metadata,
-                "created_at": doc.created_at.isoformat() if doc.created_at else None,
-                "updated_at": doc.updated_at.isoformat() if doc.updated_at else None
-            }
-            for doc in documents
-        ]
+        return _format_docs(documents, include_score=False)
     except Exception as e:
         logger.error(f"Error getting all documents: {str(e)}")
         return []
 
-@mcp.tool()
 async def get_document_count() -> Dict[str, Any]:
     """
     Get the total count of documents in the MongoDB Atlas knowledge base.
@@ -84,8 +80,7 @@ async def get_document_count() -> Dict[str, Any]:
         logger.error(f"Error getting document count: {str(e)}")
         return {"total_documents": 0, "error": str(e)}
 
-@mcp.tool()
-async def search_documents_by_metadata(metadata_filter: Dict[str, Any], limit: int = 10) -> List[Dict[str, Any]]:
+async def search_documents_by_metadata(metadata_filter: Dict[str, Any], limit: int = 10) -> List[ToolDocument]:
     """
     Search for documents by metadata filters in the MongoDB Atlas knowledge base.
     
@@ -102,22 +97,12 @@ async def search_documents_by_metadata(metadata_filter: Dict[str, Any], limit: i
             mongo_filter[f"metadata.{key}"] = value
         
         documents = await mongodb_service.search_documents("", limit, mongo_filter)
-        return [
-            {
-                "id": doc.id,
-                "content": doc.content,
-                "metadata": doc.metadata,
-                "created_at": doc.created_at.isoformat() if doc.created_at else None,
-                "updated_at": doc.updated_at.isoformat() if doc.updated_at else None
-            }
-            for doc in documents
-        ]
+        return _format_docs(documents, include_score=False)
     except Exception as e:
         logger.error(f"Error searching documents by metadata: {str(e)}")
         return []
 
-@mcp.tool()
-async def search_documents_semantic(query: str, limit: int = 10) -> List[Dict[str, Any]]:
+async def search_documents_semantic(query: str, limit: int = 10) -> List[ToolDocument]:
     """
     Advanced semantic search for documents with enhanced relevance scoring and fuzzy matching.
     
@@ -129,23 +114,12 @@ async def search_documents_semantic(query: str, limit: int = 10) -> List[Dict[st
         List of documents matching the search query with advanced relevance ranking
     """
     try:
-        documents = await mongodb_service.search_documents_semantic(query, limit)
-        return [
-            {
-                "id": doc.id,
-                "content": doc.content[:500] + "..." if len(doc.content) > 500 else doc.content,
-                "metadata": doc.metadata,
-                "relevance_score": getattr(doc, '_search_score', 1),
-                "created_at": doc.created_at.isoformat() if doc.created_at else None,
-                "updated_at": doc.updated_at.isoformat() if doc.updated_at else None
-            }
-            for doc in documents
-        ]
+        documents = await mongodb_service.search_documents_semantic(query, limit, content_limit=TOOL_CONTENT_LIMIT + 1)
+        return _format_docs(documents, truncate=TOOL_CONTENT_LIMIT)
     except Exception as e:
         logger.error(f"Error in semantic search: {str(e)}")
         return []
 
-@mcp.resource("server://info")
 async def get_server_info() -> str:
     """Get information about the ChatGTG MCP server"""
     return f"""
@@ -161,7 +135,6 @@ ChatGTG MCP Server Information:
   - search_documents_by_metadata: Search by metadata filters
 """
 
-@mcp.resource("database://status")
 async def get_database_status() -> str:
     """Get the current status of the MongoDB Atlas connection"""
     try:
@@ -186,16 +159,14 @@ Database Status: ERROR
 - Error: {str(e)}
 """
 
-async def start_mcp_server():
-    """Start the MCP server"""
-    try:
-        if not await mongodb_service.is_connected():
-            await mongodb_service.connect()
-        
-        logger.info(f"Starting MCP server: {settings.mcp_server_name} v{settings.mcp_server_version}")
-        return mcp
-    except Exception as e:
-        logger.error(f"Failed to start MCP server: {str(e)}")
-        raise
+@lru_cache(maxsize=1)
+def get_mcp() -> FastMCP:
+    """Build the FastMCP server and register its tools and resources on first use"""
+    mcp = FastMCP(settings.mcp_server_name, tool_serializer=_serialize_tool_result)
+    for tool in (search_documents, get_all_documents, get_document_count, search_documents_by_metadata, search_documents_semantic):
+        mcp.tool(tool)
+    mcp.resource("server://info")(get_server_info)
+    mcp.resource("database://status")(get_database_status)
+    return mcp
 
-__all__ = ["mcp", "start_mcp_server", "search_documents", "get_all_documents", "get_document_count", "search_documents_by_metadata"]
+__all__ = ["get_mcp", "search_documents", "get_all_documents", "get_document_count", "search_documents_by_metadata", "search_documents_semantic"]
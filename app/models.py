@@ -1,6 +1,19 @@
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import time
+from pydantic import BaseModel, Field, field_validator
+from typing import List, Dict, Any, Optional, TypedDict, NotRequired
+from datetime import datetime, timezone
+
+def now_ms() -> int:
+    """Current time in milliseconds since the Unix epoch"""
+    return time.time_ns() // 1_000_000
+
+def to_epoch_ms(value: Any) -> Any:
+    """Convert a legacy datetime timestamp (stored as naive UTC) to epoch milliseconds"""
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp() * 1000)
+    return value
 
 class ChatMessage(BaseModel):
     role: str = Field(..., description="Role of the message sender (user, assistant, system)")
@@ -32,12 +45,39 @@ class GitHubIngestResponse(BaseModel):
     files_processed: int = Field(..., description="Number of files processed")
     documents_created: int = Field(..., description="Number of documents created in MongoDB")
 
+class ToolDocument(TypedDict):
+    id: Optional[str]
+    content: str
+    metadata: Dict[str, Any]
+    relevance_score: NotRequired[float]
+    created_at: Optional[int]
+    updated_at: Optional[int]
+
 class Document(BaseModel):
     id: Optional[str] = Field(default=None, description="Document ID")
     content: str = Field(..., description="Document content")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="Document metadata")
-    created_at: datetime = Field(default_factory=datetime.utcnow, description="Creation timestamp")
-    updated_at: datetime = Field(default_factory=datetime.utcnow, description="Update timestamp")
+    created_at: int = Field(default_factory=now_ms, description="Creation timestamp in milliseconds since the Unix epoch")
+    updated_at: int = Field(default_factory=now_ms, description="Update timestamp in milliseconds since the Unix epoch")
+    search_score: Optional[float] = Field(default=None, exclude=True, description="Relevance score assigned by the search that returned this document")
+
+    @field_validator("created_at", "updated_at", mode="before")
+    @classmethod
+    def _coerce_legacy_timestamp(cls, value: Any) -> Any:
+        return to_epoch_ms(value)
+
+    def to_tool_dict(self, truncate: Optional[int] = None) -> ToolDocument:
+        """Serialize the document for MCP tool responses, optionally truncating content"""
+        content = self.content
+        if truncate is not None and len(content) > truncate:
+            content = content[:truncate] + "..."
+        return {
+            "id": self.id,
+            "content": content,
+            "metadata": self.metadata,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at
+        }
 
 class DocumentSearchRequest(BaseModel):
     query: str = Field(..., description="Search query")
@@ -1,8 +1,10 @@
 import logging
 import os
+import re
+import fnmatch
 import tempfile
 import shutil
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable, Iterator, Set
 import git
 import asyncio
 from pathlib import Path
@@ -12,17 +14,111 @@ from .mongodb_service import mongodb_service
 
 logger = logging.getLogger(__name__)
 
+INGEST_CONCURRENCY = 32
+INGEST_BATCH_SIZE = 500
+BINARY_SNIFF_BYTES = 8192
+GITHUB_URL_PREFIX = "https://github.com/"
+CLONE_OPTIONS = ["--depth=1", "--single-branch", "--no-tags"]
+SKIPPED_DIRS = frozenset({
+    ".git", ".hg", ".svn", "node_modules", ".venv", "venv", "__pycache__",
+    "dist", "build", "target", ".next", ".tox", ".mypy_cache", ".pytest_cache"
+})
+
 class GitHubService:
     def __init__(self):
         self.github_token = settings.github_token
+        self._cleanup_tasks: Set[asyncio.Task] = set()
+        if self.github_token and self.github_token != "your-github-token-here":
+            self._auth_prefix: Optional[str] = f"https://{self.github_token}@github.com/"
+        else:
+            self._auth_prefix = None
 
     def _get_auth_url(self, repo_url: str) -> str:
         """Convert GitHub URL to authenticated URL"""
-        if self.github_token and self.github_token != "your-github-token-here":
-            if repo_url.startswith("https://github.com/"):
-                return repo_url.replace("https://github.com/", f"https://{self.github_token}@github.com/")
+        if self._auth_prefix and repo_url.startswith(GITHUB_URL_PREFIX):
+            return self._auth_prefix + repo_url[len(GITHUB_URL_PREFIX):]
         return repo_url
 
+    def _remove_temp_dir(self, temp_dir: str):
+        """Delete a cloned checkout; runs in a worker thread"""
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        logger.info(f"Cleaned up temporary directory: {temp_dir}")
+
+    def _schedule_cleanup(self, temp_dir: str):
+        """Remove temp_dir in the background so the ingest response is not held up by the unlinks"""
+        task = asyncio.create_task(asyncio.to_thread(self._remove_temp_dir, temp_dir))
+        self._cleanup_tasks.add(task)
+        task.add_done_callback(self._cleanup_tasks.discard)
+
+    def _walk_files(self, root: str) -> Iterator[os.DirEntry]:
+        """Recursively yield regular file entries under root using a single os.scandir walk, pruning SKIPPED_DIRS and skipping symlinks"""
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIPPED_DIRS:
+                        yield from self._walk_files(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+    def _compile_patterns(self, patterns: List[str], root: str) -> Callable[[os.DirEntry], bool]:
+        """Build a predicate that matches entries the way rglob did: by file name, or by path for patterns with a '/'"""
+        unique_patterns = dict.fromkeys(patterns)
+        name_patterns = [pattern for pattern in unique_patterns if "/" not in pattern]
+        path_patterns = [pattern for pattern in unique_patterns if "/" in pattern]
+        
+        name_regex = None
+        if name_patterns:
+            name_regex = re.compile("|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in name_patterns))
+        path_regex = None
+        if path_patterns:
+            # rglob anchors a path pattern at any directory depth
+            path_regex = re.compile("(?:.*/)?(?:" + "|".join(f"(?:{fnmatch.translate(pattern)})" for pattern in path_patterns) + ")")
+        
+        def matches(entry: os.DirEntry) -> bool:
+            if name_regex is not None and name_regex.match(entry.name):
+                return True
+            if path_regex is not None:
+                return path_regex.match(Path(os.path.relpath(entry.path, root)).as_posix()) is not None
+            return False
+        
+        return matches
+
+    def _process_file(self, entry: os.DirEntry, repo_path: Path, request: GitHubIngestRequest) -> Optional[Document]:
+        """Read a single file and build its Document, or return None if it should be skipped"""
+        file_path = Path(entry.path)
+        try:
+            file_size = entry.stat(follow_symlinks=False).st_size
+            if file_size > request.max_file_size:
+                logger.warning(f"Skipping large file: {file_path} ({file_size} bytes)")
+                return None
+            
+            raw = file_path.read_bytes()
+            if b"\x00" in raw[:BINARY_SNIFF_BYTES]:
+                logger.debug(f"Skipping binary file: {file_path}")
+                return None
+            content = raw.decode("utf-8", errors="replace")
+            
+            relative_path = file_path.relative_to(repo_path)
+            metadata = {
+                "source": "github",
+                "repository_url": request.repository_url,
+                "branch": request.branch,
+                "file_path": str(relative_path),
+                "file_name": file_path.name,
+                "file_extension": file_path.suffix,
+                "file_size": file_size,
+                "title": f"{request.repository_url.split('/')[-1]}: {relative_path}"
+            }
+            
+            return Document(
+                content=content,
+                metadata=metadata
+            )
+            
+        except Exception as e:
+            logger.error(f"Error processing file {file_path}: {str(e)}")
+            return None
+
     async def ingest_repository(self, request: GitHubIngestRequest) -> GitHubIngestResponse:
         """Ingest a GitHub repository into MongoDB"""
         temp_dir = None
@@ -31,51 +127,64 @@ class GitHubService:
             logger.info(f"Cloning repository {request.repository_url} to {temp_dir}")
             
             auth_url = self._get_auth_url(request.repository_url)
-            repo = git.Repo.clone_from(auth_url, temp_dir, branch=request.branch)
-            
-            documents = []
-            files_processed = 0
+            await asyncio.to_thread(
+                git.Repo.clone_from,
+                auth_url,
+                temp_dir,
+                branch=request.branch,
+                multi_options=CLONE_OPTIONS,
+                env={"GIT_TERMINAL_PROMPT": "0"}
+            )
             
             repo_path = Path(temp_dir)
-            for pattern in request.file_patterns:
-                for file_path in repo_path.rglob(pattern):
-                    if file_path.is_file():
-                        try:
-                            if file_path.stat().st_size > request.max_file_size:
-                                logger.warning(f"Skipping large file: {file_path} ({file_path.stat().st_size} bytes)")
-                                continue
-                            
-                            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                                content = f.read()
-                            
-                            relative_path = file_path.relative_to(repo_path)
-                            metadata = {
-                                "source": "github",
-                                "repository_url": request.repository_url,
-                                "branch": request.branch,
-                                "file_path": str(relative_path),
-                                "file_name": file_path.name,
-                                "file_extension": file_path.suffix,
-                                "file_size": file_path.stat().st_size,
-                                "title": f"{request.repository_url.split('/')[-1]}: {relative_path}"
-                            }
-                            
-                            document = Document(
-                                content=content,
-                                metadata=metadata
-                            )
-                            documents.append(document)
-                            files_processed += 1
-                            
-                        except Exception as e:
-                            logger.error(f"Error processing file {file_path}: {str(e)}")
-                            continue
+            entries: List[os.DirEntry] = []
+            if request.file_patterns:
+                matcher = self._compile_patterns(request.file_patterns, temp_dir)
+                candidates = await asyncio.to_thread(list, self._walk_files(temp_dir))
+                entries = [entry for entry in candidates if matcher(entry)]
+            
+            # Bounded queue so readers pause while a batch is being inserted
+            pending_entries = iter(entries)
+            documents: asyncio.Queue = asyncio.Queue(maxsize=INGEST_BATCH_SIZE)
+            
+            async def _produce() -> None:
+                # A cancelled producer skips the sentinel; nothing is reading the queue by then
+                try:
+                    for entry in pending_entries:
+                        document = await asyncio.to_thread(self._process_file, entry, repo_path, request)
+                        if document is not None:
+                            await documents.put(document)
+                except Exception as e:
+                    logger.error(f"Error reading files from {request.repository_url}: {str(e)}")
+                await documents.put(None)
+            
+            producers = [asyncio.create_task(_produce()) for _ in range(min(INGEST_CONCURRENCY, len(entries)))]
+            
+            files_processed = 0
+            documents_created = 0
+            batch: List[Document] = []
+            try:
+                active_producers = len(producers)
+                while active_producers:
+                    document = await documents.get()
+                    if document is None:
+                        active_producers -= 1
+                        continue
+                    
+                    batch.append(document)
+                    files_processed += 1
+                    if len(batch) >= INGEST_BATCH_SIZE:
+                        document_ids = await mongodb_service.insert_documents(batch)
+                        documents_created += len(document_ids)
+                        batch.clear()
+            finally:
+                for producer in producers:
+                    producer.cancel()
+                await asyncio.gather(*producers, return_exceptions=True)
             
-            if documents:
-                document_ids = await mongodb_service.insert_documents(documents)
-                documents_created = len(document_ids)
-            else:
-                documents_created = 0
+            if batch:
+                document_ids = await mongodb_service.insert_documents(batch)
+                documents_created += len(document_ids)
             
             logger.info(f"Successfully ingested {files_processed} files, created {documents_created} documents")
             
@@ -97,7 +206,6 @@ class GitHubService:
         
         finally:
             if temp_dir and os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-                logger.info(f"Cleaned up temporary directory: {temp_dir}")
+                self._schedule_cleanup(temp_dir)
 
 github_service = GitHubService()
@@ -1,102 +1,29 @@
 import logging
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from collections import OrderedDict
+from contextlib import aclosing
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Dict, Any, Final, Mapping, Optional, AsyncGenerator, Awaitable, Callable, Iterator, Set, Tuple
 import json
+import re
+import orjson
 import asyncio
+import time
+import uuid
+import httpx
 from openai import AsyncOpenAI
 from ..config import settings
 from ..models import ChatMessage, ChatRequest, ChatResponse
 
 logger = logging.getLogger(__name__)
 
-class LLMService:
-    def __init__(self):
-        self.client = AsyncOpenAI(
-            api_key=settings.openai_api_key,
-            base_url=settings.openai_base_url
-        )
-        self.model = settings.openai_model
+# System prompts are sent byte-identical at index 0 of every request so the backend's
+# prefix cache can reuse them; per-request content belongs in later user messages
 
-
-
-    async def _parse_and_execute_tool_call(self, response_text: str) -> str:
-        """Parse JSON function call from response text and execute via MCP"""
-        logger.debug(f"Parsing tool call from response: {response_text}")
-        logger.info(f"Attempting to parse and execute MCP tool call")
-        try:
-            import json
-            import re
-            
-            function_call = None
-            
-            try:
-                function_call = json.loads(response_text.strip())
-                if isinstance(function_call, dict) and "function" in function_call:
-                    pass
-                else:
-                    raise json.JSONDecodeError("Not a function call", response_text, 0)
-            except json.JSONDecodeError:
-                json_pattern = r'\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}'
-                matches = re.findall(json_pattern, response_text)
-                function_call = None
-                for match in matches:
-                    try:
-                        parsed = json.loads(match)
-                        if isinstance(parsed, dict) and "function" in parsed:
-                            function_call = parsed
-                            break
-                    except json.JSONDecodeError:
-                        continue
-                
-                if not function_call:
-                    return "Error: Could not find JSON function call in response"
-            
-            function_name = function_call.get("function")
-            parameters = function_call.get("parameters", {})
-            logger.debug(f"Function name: {function_name}, Parameters: {parameters}")
-            
-            try:
-                from ..mcp_server import mcp
-                
-                tool = await mcp.get_tool(function_name)
-                if tool and hasattr(tool, 'fn') and callable(tool.fn):
-                    result = await tool.fn(**parameters)
-                    
-                    if isinstance(result, list) and result:
-                        formatted_result = []
-                        for i, doc in enumerate(result):
-                            if isinstance(doc, dict):
-                                formatted_doc = {
-                                    "document_number": i + 1,
-                                    "title": doc.get("metadata", {}).get("title", "Untitled Document"),
-                                    "url": doc.get("metadata", {}).get("url", doc.get("metadata", {}).get("source_url", "No URL available")),
-                                    "content": doc.get("content", "No content available")[:1000] + ("..." if len(doc.get("content", "")) > 1000 else ""),
-                                    "metadata": doc.get("metadata", {}),
-                                    "relevance_score": doc.get("_search_score", "N/A")
-                                }
-                                formatted_result.append(formatted_doc)
-                        return json.dumps(formatted_result, indent=2)
-                    else:
-                        return json.dumps(result, indent=2)
-                else:
-                    return f"Error: MCP tool '{function_name}' not found or not callable"
-                    
-            except Exception as e:
-                logger.error(f"Error calling MCP tool '{function_name}': {str(e)}")
-                return f"Error calling MCP tool '{function_name}': {str(e)}"
-                
-        except Exception as e:
-            logger.error(f"Error parsing/executing MCP tool call: {str(e)}")
-            return f"Error executing MCP tool call: {str(e)}"
-
-
-    async def chat_completion(self, request: ChatRequest) -> ChatResponse:
-        """Generate chat completion with custom tool calling support for VLLM"""
-        try:
-            messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
-            
-            system_message = {
-                "role": "system",
-                "content": """You are ChatGTG, an AI assistant with access to a document knowledge base.
+# Prompt that asks the model to answer with a JSON tool call for document questions
+_SYSTEM_PROMPT_MSG: Final[Dict[str, str]] = {
+    "role": "system",
+    "content": """You are ChatGTG, an AI assistant with access to a document knowledge base.
 
 IMPORTANT: When users ask about documents, information, or data, respond with ONLY a JSON function call in this exact format:
 
@@ -127,31 +54,12 @@ RULES:
 - No apologies or disclaimers
 
 For non-document questions, respond normally."""
-            }
-            messages.insert(0, system_message)
-            
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                max_tokens=request.max_tokens,
-                temperature=request.temperature
-            )
-            
-            assistant_response = response.choices[0].message.content
-            logger.info(f"First LLM response: {assistant_response}")
-            logger.info(f"Function detection check: function in response = {'"function"' in assistant_response if assistant_response else False}, has braces = {'{' in assistant_response if assistant_response else False}")
-            
-            if assistant_response and '"function"' in assistant_response and '{' in assistant_response:
-                logger.info(f"Function call detected, executing MCP tool...")
-                tool_result = await self._parse_and_execute_tool_call(assistant_response)
-                logger.info(f"MCP tool executed, result length: {len(str(tool_result))}")
-                
-                original_user_message = messages[1]  # Skip the system message
-                
-                conversational_messages = [
-                    {
-                        "role": "system",
-                        "content": """You are ChatGTG, a helpful AI assistant. Your job is to analyze document search results and provide comprehensive, detailed responses to users' questions.
+}
+
+# Prompt that turns MCP tool results into the final answer
+_CONVERSATIONAL_SYSTEM_MSG: Final[Dict[str, str]] = {
+    "role": "system",
+    "content": """You are ChatGTG, a helpful AI assistant. Your job is to analyze document search results and provide comprehensive, detailed responses to users' questions.
 
 IMPORTANT RESPONSE GUIDELINES:
 - Provide detailed, comprehensive answers (aim for 3-5 paragraphs minimum)
@@ -170,16 +78,469 @@ RESPONSE FORMAT:
 3. Include relevant quotes or excerpts from source documents
 4. List source documents with titles and URLs at the end
 5. Suggest related topics or follow-up questions if appropriate"""
-                    },
-                    original_user_message,
-                    {
-                        "role": "user",
-                        "content": f"I searched for documents related to your question and found the following results:\n\n{tool_result}\n\nBased on these documents, please provide a comprehensive, detailed answer to my original question. Include document URLs and titles in your response, quote relevant sections, and structure your answer with clear sections. Make your response thorough and informative (3-5 paragraphs minimum)."
+}
+
+# Tool-call parsing for responses longer than this runs in a worker thread
+LARGE_RESPONSE_CHARS = 100_000
+
+# Limit used for the speculative search and required of a tool call to reuse it
+SPECULATIVE_SEARCH_LIMIT = 10
+
+def _find_json_candidates(text: str) -> Iterator[str]:
+    """Yield each top-level {...} span in text using a single brace-depth scan"""
+    depth = 0
+    start = 0
+    in_string = False
+    escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            # Quotes only delimit strings inside an object; prose quotes must not hide braces
+            in_string = depth > 0
+        elif char == "{":
+            if depth == 0:
+                start = index
+            depth += 1
+        elif char == "}" and depth:
+            depth -= 1
+            if depth == 0:
+                yield text[start:index + 1]
+
+def _find_function_object(value: Any) -> Optional[Dict[str, Any]]:
+    """Return the first dict carrying a "function" key, searching nested containers"""
+    if isinstance(value, dict):
+        if "function" in value:
+            return value
+        value = list(value.values())
+    if isinstance(value, list):
+        for item in value:
+            found = _find_function_object(item)
+            if found is not None:
+                return found
+    return None
+
+def _is_tool_call_response(text: str) -> bool:
+    """Cheap check that a response is a bare JSON tool call rather than prose"""
+    stripped = text.lstrip()
+    return stripped.startswith("{") and '"function"' in stripped[:256]
+
+def _query_tokens(query: str) -> Set[str]:
+    """Lowercased word tokens of a search query, ignoring order, punctuation and repeats"""
+    return set(re.findall(r"\w+", query.lower()))
+
+def _matches_speculative_search(user_text: str, function_name: Optional[str], parameters: Dict[str, Any]) -> bool:
+    """Whether a parsed tool call asks for a search the prefetch already covers"""
+    # The model distills the message into search terms, so accept any query built from the user's own words;
+    # $text ORs the terms, so the prefetched results already rank documents matching them
+    query_tokens = _query_tokens(str(parameters.get("query", "")))
+    return (
+        function_name == "search_documents"
+        and parameters.get("limit", SPECULATIVE_SEARCH_LIMIT) == SPECULATIVE_SEARCH_LIMIT
+        and bool(query_tokens)
+        and query_tokens <= _query_tokens(user_text)
+    )
+
+def _extract_function_call(text: str) -> Optional[Dict[str, Any]]:
+    """Parse the JSON function call out of an LLM response, or None if there is none"""
+    try:
+        parsed = orjson.loads(text.strip())
+        if isinstance(parsed, dict) and "function" in parsed:
+            return parsed
+    except (ValueError, RecursionError):
+        pass
+    
+    for candidate in _find_json_candidates(text):
+        try:
+            function_call = _find_function_object(orjson.loads(candidate))
+        except (ValueError, RecursionError):
+            continue
+        if function_call is not None:
+            return function_call
+    return None
+
+def _is_cacheable_tool_result(result: Any) -> bool:
+    """Whether a tool result reflects real data; MCP tools swallow failures and return [] or an "error" payload"""
+    if isinstance(result, dict):
+        return "error" not in result
+    return bool(result)
+
+@lru_cache(maxsize=1)
+def _tool_dispatch() -> Mapping[str, Callable[..., Awaitable[Any]]]:
+    """Direct references to the built-in MCP tool functions, skipping the registry lookup"""
+    # Imported lazily: mcp_server pulls in the services package, which imports this module
+    from .. import mcp_server
+    
+    return MappingProxyType({
+        "search_documents": mcp_server.search_documents,
+        "search_documents_semantic": mcp_server.search_documents_semantic,
+        "get_all_documents": mcp_server.get_all_documents,
+        "get_document_count": mcp_server.get_document_count,
+        "search_documents_by_metadata": mcp_server.search_documents_by_metadata
+    })
+
+def _call_on_owner_loop(target: asyncio.Future, callback: Callable[..., Any], *args):
+    """Run a callback on the loop that owns a task or future; a closed loop has no waiters left to notify"""
+    owner = target.get_loop()
+    if owner.is_closed():
+        return
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if owner is running:
+        callback(*args)
+    else:
+        owner.call_soon_threadsafe(callback, *args)
+
+def _reject(future: asyncio.Future, error: Exception):
+    """Fail a future unless it has already been resolved or cancelled"""
+    if not future.done():
+        future.set_exception(error)
+
+class _BatchDispatcher:
+    """Coalesce completion requests arriving within a short window and send them upstream together"""
+
+    def __init__(self, send: Callable[..., Awaitable[Any]], window_ms: int, max_size: int):
+        self._send = send
+        self._window = window_ms / 1000
+        self._max_size = max(1, max_size)
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches: Set[asyncio.Task] = set()
+        self._pending: Set[asyncio.Future] = set()
+
+    async def submit(self, **kwargs) -> Any:
+        """Queue one completion request and wait for its response"""
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._worker.get_loop() is not loop:
+            self._abandon(RuntimeError("LLM batch dispatcher restarted on a new event loop"))
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = loop.create_future()
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        self._queue.put_nowait((kwargs, future))
+        return await future
+
+    async def aclose(self):
+        """Stop the worker and fail every request that has not been answered yet"""
+        loop = asyncio.get_running_loop()
+        tasks = self._abandon(RuntimeError("LLM batch dispatcher closed"))
+        await asyncio.gather(*(task for task in tasks if task.get_loop() is loop), return_exceptions=True)
+
+    def _abandon(self, error: Exception) -> List[asyncio.Task]:
+        """Cancel the worker and in-flight batches and fail their pending futures, each on its own loop"""
+        tasks = [task for task in (self._worker, *self._dispatches) if task is not None and not task.done()]
+        for task in tasks:
+            _call_on_owner_loop(task, task.cancel)
+        for future in self._pending:
+            _call_on_owner_loop(future, _reject, future, error)
+        
+        self._pending = set()
+        self._dispatches = set()
+        self._worker = None
+        self._queue = None
+        return tasks
+
+    async def _run(self):
+        """Gather up to max_size requests per window and hand each batch off without blocking the next"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self._window
+            while len(batch) < self._max_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            task = asyncio.create_task(self._dispatch(batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        """Send a batch concurrently and resolve each caller's future"""
+        logger.debug(f"Dispatching batch of {len(batch)} completion requests")
+        results = await asyncio.gather(*(self._send(**kwargs) for kwargs, _ in batch), return_exceptions=True)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+class ChatResponseCache:
+    """In-process LRU cache of chat responses keyed on the normalized conversation"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, Tuple[float, ChatResponse]] = OrderedDict()
+
+    def _key(self, request: ChatRequest) -> str:
+        conversation = [(msg.role, " ".join(msg.content.split())) for msg in request.messages]
+        return json.dumps([conversation, request.max_tokens, request.temperature])
+
+    def lookup(self, request: ChatRequest) -> Optional[ChatResponse]:
+        """Return a copy of the cached response for this conversation, if one is still fresh"""
+        if self.max_entries <= 0:
+            return None
+        
+        key = self._key(request)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        
+        expires_at, response = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        
+        self._entries.move_to_end(key)
+        return response.model_copy(update={"id": f"chatcmpl-{uuid.uuid4().hex}", "created": int(time.time())})
+
+    def store(self, request: ChatRequest, response: ChatResponse):
+        """Cache a response, evicting the least recently used entries beyond max_entries"""
+        if self.max_entries <= 0:
+            return
+        
+        key = self._key(request)
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """Drop every cached response, e.g. after the knowledge base changes"""
+        self._entries.clear()
+
+class LLMService:
+    def __init__(self):
+        self.client = AsyncOpenAI(
+            api_key=settings.openai_api_key,
+            base_url=settings.openai_base_url,
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            )
+        )
+        self.model = settings.openai_model
+        self.response_cache = ChatResponseCache(settings.chat_cache_max_entries, settings.chat_cache_ttl_seconds)
+        self._tool_cache: Dict[str, Any] = {}
+        self._llm_semaphore = asyncio.Semaphore(settings.openai_max_concurrent)
+        self._batcher: Optional[_BatchDispatcher] = None
+        if settings.llm_batch_window_ms > 0:
+            self._batcher = _BatchDispatcher(self._send_completion, settings.llm_batch_window_ms, settings.llm_batch_max_size)
+
+
+
+    async def aclose(self):
+        """Shut down the completion micro-batcher, failing requests still waiting on it"""
+        if self._batcher is not None:
+            await self._batcher.aclose()
+
+    async def _send_completion(self, **kwargs) -> Any:
+        """Issue one chat completion request to the LLM endpoint, capped at openai_max_concurrent in flight"""
+        if not kwargs.get("stream"):
+            async with self._llm_semaphore:
+                return await self.client.chat.completions.create(**kwargs)
+        
+        await self._llm_semaphore.acquire()
+        try:
+            stream = await self.client.chat.completions.create(**kwargs)
+        except BaseException:
+            self._llm_semaphore.release()
+            raise
+        return self._hold_permit(stream)
+
+    async def _hold_permit(self, stream: Any) -> AsyncGenerator[Any, None]:
+        """Yield chunks from a streamed completion, releasing its concurrency permit once the stream is read or closed"""
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            self._llm_semaphore.release()
+            await stream.close()
+
+    async def _create_completion(self, **kwargs) -> Any:
+        """Create a chat completion, through the micro-batcher when it is enabled"""
+        if self._batcher is not None and not kwargs.get("stream"):
+            return await self._batcher.submit(**kwargs)
+        return await self._send_completion(**kwargs)
+
+    async def _get_tool(self, function_name: str) -> Any:
+        """Look up an MCP tool, asking the registry only the first time a name is seen"""
+        tool = self._tool_cache.get(function_name)
+        if tool is None:
+            from ..mcp_server import get_mcp
+            
+            tool = await get_mcp().get_tool(function_name)
+            self._tool_cache[function_name] = tool
+        return tool
+
+    def _format_tool_result(self, result: Any) -> str:
+        """Render an MCP tool result as the JSON text handed to the second LLM call"""
+        if isinstance(result, list) and result:
+            formatted_result = []
+            for i, doc in enumerate(result):
+                if isinstance(doc, dict):
+                    content = doc.get("content") or "No content available"
+                    metadata = doc.get("metadata") or {}
+                    formatted_doc = {
+                        "document_number": i + 1,
+                        "title": metadata.get("title", "Untitled Document"),
+                        "url": metadata.get("url") or metadata.get("source_url", "No URL available"),
+                        "content": content if len(content) <= 1000 else content[:1000] + "...",
+                        "metadata": metadata,
+                        "relevance_score": doc.get("relevance_score", "N/A")
                     }
-                ]
+                    formatted_result.append(formatted_doc)
+            return orjson.dumps(formatted_result, option=orjson.OPT_INDENT_2, default=str).decode()
+        else:
+            return orjson.dumps(result, option=orjson.OPT_INDENT_2, default=str).decode()
+
+    def _start_speculative_search(self, request: ChatRequest) -> Optional[Tuple[str, asyncio.Task]]:
+        """Kick off search_documents for the last user message while the first LLM call runs"""
+        if not settings.chat_speculative_search:
+            return None
+        user_text = next((msg.content for msg in reversed(request.messages) if msg.role == "user"), "")
+        if not user_text.strip():
+            return None
+        
+        return user_text, asyncio.create_task(self._speculative_search(user_text))
+
+    async def _speculative_search(self, user_text: str) -> List[Dict[str, Any]]:
+        """Run search_documents' query directly against MongoDB so failures raise instead of returning []"""
+        from ..mcp_server import TOOL_CONTENT_LIMIT, _format_docs
+        from .mongodb_service import mongodb_service
+        
+        documents = await mongodb_service.search_documents(user_text, SPECULATIVE_SEARCH_LIMIT, content_limit=TOOL_CONTENT_LIMIT + 1)
+        return _format_docs(documents, truncate=TOOL_CONTENT_LIMIT)
+
+    def _discard_speculative_search(self, speculative: Optional[Tuple[str, asyncio.Task]]):
+        """Cancel an unused speculative search without leaving its exception unretrieved"""
+        if speculative is None:
+            return
+        task = speculative[1]
+        task.cancel()
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    async def _parse_and_execute_tool_call(self, response_text: str, speculative: Optional[Tuple[str, asyncio.Task]] = None) -> Tuple[Optional[str], bool]:
+        """Parse JSON function call from response text and execute via MCP, returning the result (None if there is no call) and whether it is safe to cache"""
+        logger.debug(f"Parsing tool call from response: {response_text}")
+        logger.info(f"Attempting to parse and execute MCP tool call")
+        try:
+            if len(response_text) > LARGE_RESPONSE_CHARS:
+                function_call = await asyncio.to_thread(_extract_function_call, response_text)
+            else:
+                function_call = _extract_function_call(response_text)
+            
+            if not function_call:
+                logger.info("No JSON function call found in response")
+                return None, True
+            
+            function_name = function_call.get("function")
+            parameters = function_call.get("parameters", {})
+            logger.debug(f"Function name: {function_name}, Parameters: {parameters}")
+            
+            if speculative is not None and _matches_speculative_search(speculative[0], function_name, parameters):
+                try:
+                    result = await speculative[1]
+                    if result:
+                        logger.info("Using speculative search_documents result")
+                        return self._format_tool_result(result), True
+                    logger.info("Speculative search found nothing, running the tool call instead")
+                except Exception as e:
+                    logger.warning(f"Speculative search failed, running the tool call instead: {str(e)}")
+            
+            try:
+                tool_fn = _tool_dispatch().get(function_name)
+                if tool_fn is None:
+                    tool = await self._get_tool(function_name)
+                    if tool and hasattr(tool, 'fn') and callable(tool.fn):
+                        tool_fn = tool.fn
+                    else:
+                        return f"Error: MCP tool '{function_name}' not found or not callable", False
+                
+                result = await tool_fn(**parameters)
+                return self._format_tool_result(result), _is_cacheable_tool_result(result)
+                    
+            except Exception as e:
+                logger.error(f"Error calling MCP tool '{function_name}': {str(e)}")
+                return f"Error calling MCP tool '{function_name}': {str(e)}", False
+                
+        except Exception as e:
+            logger.error(f"Error parsing/executing MCP tool call: {str(e)}")
+            return f"Error executing MCP tool call: {str(e)}", False
+
+
+    def _build_messages(self, request: ChatRequest) -> List[Dict[str, str]]:
+        """Build the tool-selection prompt followed by the user's conversation"""
+        messages = [{"role": msg.role, "content": msg.content} for msg in request.messages]
+        
+        messages.insert(0, _SYSTEM_PROMPT_MSG)
+        return messages
+
+    def _build_conversational_messages(self, original_user_message: Dict[str, str], tool_result: str) -> List[Dict[str, str]]:
+        """Build the prompt that turns MCP tool results into the final answer"""
+        return [
+            _CONVERSATIONAL_SYSTEM_MSG,
+            original_user_message,
+            {
+                "role": "user",
+                "content": f"I searched for documents related to your question and found the following results:\n\n{tool_result}\n\nBased on these documents, please provide a comprehensive, detailed answer to my original question. Include document URLs and titles in your response, quote relevant sections, and structure your answer with clear sections. Make your response thorough and informative (3-5 paragraphs minimum)."
+            }
+        ]
+
+    async def chat_completion(self, request: ChatRequest) -> ChatResponse:
+        """Generate chat completion with custom tool calling support for VLLM"""
+        speculative = None
+        try:
+            cached_response = self.response_cache.lookup(request)
+            if cached_response is not None:
+                logger.info("Returning cached chat response")
+                return cached_response
+            
+            messages = self._build_messages(request)
+            speculative = self._start_speculative_search(request)
+            
+            response = await self._create_completion(
+                model=self.model,
+                messages=messages,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature
+            )
+            
+            assistant_response = response.choices[0].message.content
+            logger.info(f"First LLM response: {assistant_response}")
+            
+            tool_result = None
+            cacheable = True
+            if assistant_response and _is_tool_call_response(assistant_response):
+                logger.info(f"Function call detected, executing MCP tool...")
+                tool_result, cacheable = await self._parse_and_execute_tool_call(assistant_response, speculative)
+            self._discard_speculative_search(speculative)
+            
+            if tool_result is not None:
+                logger.info(f"MCP tool executed, result length: {len(tool_result)}")
+                
+                original_user_message = messages[1]  # Skip the system message
+                conversational_messages = self._build_conversational_messages(original_user_message, tool_result)
                 
                 logger.info(f"Making second LLM call to process tool results...")
-                final_response = await self.client.chat.completions.create(
+                final_response = await self._create_completion(
                     model=self.model,
                     messages=conversational_messages,
                     max_tokens=request.max_tokens,
@@ -188,7 +549,7 @@ RESPONSE FORMAT:
                 logger.info(f"Second LLM call completed, returning final response")
                 logger.info(f"Final response content: {final_response.choices[0].message.content}")
                 
-                return ChatResponse(
+                chat_response = ChatResponse(
                     id=final_response.id,
                     object=final_response.object,
                     created=final_response.created,
@@ -210,10 +571,13 @@ RESPONSE FORMAT:
                         "total_tokens": final_response.usage.total_tokens
                     }
                 )
+                if cacheable:
+                    self.response_cache.store(request, chat_response)
+                return chat_response
             
             else:
                 logger.info(f"No function call detected, returning original response")
-                return ChatResponse(
+                chat_response = ChatResponse(
                     id=response.id,
                     object=response.object,
                     created=response.created,
@@ -235,9 +599,80 @@ RESPONSE FORMAT:
                         "total_tokens": response.usage.total_tokens
                     }
                 )
+                self.response_cache.store(request, chat_response)
+                return chat_response
                 
         except Exception as e:
             logger.error(f"Error in chat completion: {str(e)}")
+            self._discard_speculative_search(speculative)
             raise
 
+    def _format_sse(self, data: str) -> str:
+        """Frame a JSON payload as a server-sent event"""
+        return f"data: {data}\n\n"
+
+    async def chat_completion_stream(self, request: ChatRequest) -> AsyncGenerator[str, None]:
+        """Stream chat completion chunks as OpenAI-compatible server-sent events"""
+        try:
+            messages = self._build_messages(request)
+            
+            stream = await self._create_completion(
+                model=self.model,
+                messages=messages,
+                max_tokens=request.max_tokens,
+                temperature=request.temperature,
+                stream=True
+            )
+            
+            # Tool calls are answered with a bare JSON object, so the first visible
+            # character decides whether to pass tokens through or buffer the call
+            buffered_chunks = []
+            buffered_text = ""
+            is_tool_call = None
+            async with aclosing(stream):
+                async for chunk in stream:
+                    if is_tool_call is False:
+                        yield self._format_sse(chunk.model_dump_json(exclude_unset=True))
+                        continue
+                    
+                    buffered_chunks.append(chunk)
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        buffered_text += chunk.choices[0].delta.content
+                    
+                    if is_tool_call is None and buffered_text.strip():
+                        is_tool_call = buffered_text.lstrip().startswith("{")
+                        if not is_tool_call:
+                            for buffered in buffered_chunks:
+                                yield self._format_sse(buffered.model_dump_json(exclude_unset=True))
+                            buffered_chunks.clear()
+            
+            tool_result = None
+            if is_tool_call and _is_tool_call_response(buffered_text):
+                logger.info(f"Function call detected in stream, executing MCP tool...")
+                tool_result, _ = await self._parse_and_execute_tool_call(buffered_text)
+            
+            if tool_result is not None:
+                logger.info(f"MCP tool executed, result length: {len(tool_result)}")
+                
+                conversational_messages = self._build_conversational_messages(messages[1], tool_result)
+                final_stream = await self._create_completion(
+                    model=self.model,
+                    messages=conversational_messages,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature,
+                    stream=True
+                )
+                async with aclosing(final_stream):
+                    async for chunk in final_stream:
+                        yield self._format_sse(chunk.model_dump_json(exclude_unset=True))
+            else:
+                for buffered in buffered_chunks:
+                    yield self._format_sse(buffered.model_dump_json(exclude_unset=True))
+            
+            yield self._format_sse("[DONE]")
+            
+        except Exception as e:
+            logger.error(f"Error in streaming chat completion: {str(e)}")
+            yield self._format_sse(json.dumps({"error": {"message": str(e)}}))
+
 llm_service = LLMService()
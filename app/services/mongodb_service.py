@@ -1,80 +1,237 @@
 import logging
+import functools
+import re
 from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from pymongo.errors import ConnectionFailure, WaitQueueTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 import asyncio
 from ..config import settings
-from ..models import Document, DocumentSearchRequest, DocumentSearchResponse
+from ..models import Document, DocumentSearchRequest, DocumentSearchResponse, now_ms, to_epoch_ms
 
 logger = logging.getLogger(__name__)
 
+RECENT_DOCUMENT_WINDOW_MS = 30 * 24 * 60 * 60 * 1000
+HEALTH_CHECK_INTERVAL_SECONDS = 30
+# Keeps each insert_many well under MongoDB's 16MB message limit
+INSERT_BATCH_SIZE = 1000
+
+def reconnect_on_failure(retry: bool = True):
+    """Mark the service disconnected on a connection error and retry the call once on the same client"""
+    def decorator(method):
+        @functools.wraps(method)
+        async def wrapper(self, *args, **kwargs):
+            try:
+                return await method(self, *args, **kwargs)
+            except WaitQueueTimeoutError:
+                # A saturated pool is not a lost connection; retrying would only add load
+                raise
+            except ConnectionFailure as e:
+                logger.warning(f"MongoDB connection failure in {method.__name__}: {str(e)}")
+                self._connected = False
+                if not retry:
+                    raise
+                # The driver rediscovers the server on its own, so the client is kept
+                result = await method(self, *args, **kwargs)
+                self._connected = True
+                return result
+        return wrapper
+    return decorator
+
+_CONCEPTUAL_INDICATOR_PATTERNS = tuple(
+    re.compile(indicator, re.IGNORECASE)
+    for indicator in ("what is", "definition", "overview", "introduction", "about")
+)
+
+@functools.lru_cache(maxsize=256)
+def _query_patterns(query: str) -> Tuple[re.Pattern, Tuple[re.Pattern, ...]]:
+    """Compile the conceptual-match pattern and one pattern per technical phrase for a search query"""
+    escaped = re.escape(query)
+    conceptual = re.compile(rf"\b{escaped}\b(?!\s+(search|api|tool|function))", re.IGNORECASE)
+    # One pattern per phrase: a single alternation cannot report overlapping phrases
+    technical = tuple(
+        re.compile(phrase, re.IGNORECASE)
+        for phrase in (f"{escaped} search", f"{escaped} api", f"{escaped} tool",
+                       f"{escaped} function", f"search {escaped}", f"using {escaped}")
+    )
+    return conceptual, technical
+
+def _content_match_fields(query: str) -> Dict[str, Any]:
+    """$addFields expressions that evaluate the content-side scoring patterns on the server"""
+    conceptual_pattern, technical_patterns = _query_patterns(query)
+    
+    def matches(pattern: re.Pattern) -> Dict[str, Any]:
+        return {"$regexMatch": {"input": "$content", "regex": pattern.pattern, "options": "i"}}
+    
+    return {
+        "_conceptual_content": matches(conceptual_pattern),
+        "_technical_hits": [matches(pattern) for pattern in technical_patterns],
+        "_indicator_hits": [matches(pattern) for pattern in _CONCEPTUAL_INDICATOR_PATTERNS]
+    }
+
+def _count_phrases(patterns: Tuple[re.Pattern, ...], content_hits: List[bool], title: str) -> int:
+    """Count the phrases found in the content (per the server-side flags) or in the title"""
+    return sum(1 for pattern, hit in zip(patterns, content_hits) if hit or pattern.search(title))
+
+def _score_search_rows(rows: List[Dict[str, Any]], query: str, limit: int):
+    """Set search_score on text-search rows, boosting up to limit/3 conceptual matches
+
+    Content-side matches arrive as flags from _content_match_fields because the
+    returned content may already be truncated.
+    """
+    query_lower = query.lower()
+    _, technical_patterns = _query_patterns(query)
+    conceptual_limit = limit // 3 or limit
+    conceptual_count = 0
+    
+    for doc in rows:
+        base_score = doc.pop('_text_score', 1)
+        conceptual_content = doc.pop('_conceptual_content', False)
+        technical_hits = doc.pop('_technical_hits', [])
+        indicator_hits = doc.pop('_indicator_hits', [])
+        title = doc.get('metadata', {}).get('title', '')
+        title_lower = title.lower()
+        
+        is_conceptual = (
+            title_lower == query_lower
+            or title_lower.startswith(f"what is {query_lower}")
+            or conceptual_content
+        )
+        if is_conceptual and conceptual_count < conceptual_limit:
+            conceptual_count += 1
+            score = 15
+            if query_lower in title_lower:
+                score += 5
+        else:
+            penalty = 0.3 * _count_phrases(technical_patterns, technical_hits, title)
+            bonus = 0.2 * _count_phrases(_CONCEPTUAL_INDICATOR_PATTERNS, indicator_hits, title)
+            score = max(0.1, base_score - penalty + bonus)
+        
+        doc['search_score'] = score
+
 class MongoDBService:
     def __init__(self):
         self.client: Optional[AsyncIOMotorClient] = None
         self.database: Optional[AsyncIOMotorDatabase] = None
         self.collection: Optional[AsyncIOMotorCollection] = None
         self._connected = False
+        self._indexes_ensured = False
+        self._health_task: Optional[asyncio.Task] = None
+        self._migration_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
 
     async def connect(self):
-        """Connect to MongoDB Atlas"""
-        try:
-            self.client = AsyncIOMotorClient(settings.mongodb_uri)
+        """Connect to MongoDB Atlas, reusing the client if one is already open"""
+        async with self._connect_lock:
             if self.client is not None:
-                self.database = self.client[settings.mongodb_database]
-                if self.database is not None:
-                    self.collection = self.database[settings.mongodb_collection]
+                return
             
-            if self.client is not None:
-                await self.client.admin.command('ping')
+            client = None
+            try:
+                client = AsyncIOMotorClient(
+                    settings.mongodb_uri,
+                    maxPoolSize=settings.mongo_max_pool_size,
+                    minPoolSize=settings.mongo_min_pool_size,
+                    serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+                    waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+                    compressors=settings.mongo_compressors
+                )
+                await client.admin.command('ping')
+                
+                self.client = client
+                self.database = client[settings.mongodb_database]
+                self.collection = self.database[settings.mongodb_collection]
                 self._connected = True
                 logger.info(f"Successfully connected to MongoDB Atlas database: {settings.mongodb_database}")
                 
-                if self.collection is not None:
+                if not self._indexes_ensured:
                     await self.collection.create_index([("content", "text"), ("metadata.title", "text")])
                     await self.collection.create_index("created_at")
-            
+                    await self.collection.create_index("metadata.source")
+                    self._indexes_ensured = True
+                    # Runs in the background so a large legacy collection doesn't hold up startup
+                    self._migration_task = asyncio.create_task(self._migrate_legacy_timestamps(self.collection))
+                
+                if self._health_task is None or self._health_task.done():
+                    self._health_task = asyncio.create_task(self._monitor_health())
+                
+            except Exception as e:
+                logger.error(f"Failed to connect to MongoDB Atlas: {str(e)}")
+                self._connected = False
+                if client is not None and self.client is not client:
+                    client.close()
+                raise
+
+    async def _migrate_legacy_timestamps(self, collection: AsyncIOMotorCollection):
+        """Rewrite legacy BSON Date timestamps as epoch milliseconds so created_at sorts across old and new documents"""
+        fields = ("created_at", "updated_at")
+        try:
+            # Legacy documents have both fields as Dates; filtering on created_at alone uses its index
+            result = await collection.update_many(
+                {"created_at": {"$type": "date"}},
+                [{"$set": {
+                    field: {"$cond": [{"$eq": [{"$type": f"${field}"}, "date"]}, {"$toLong": f"${field}"}, f"${field}"]}
+                    for field in fields
+                }}]
+            )
+            if result.modified_count:
+                logger.info(f"Converted legacy timestamps to epoch milliseconds on {result.modified_count} documents")
         except Exception as e:
-            logger.error(f"Failed to connect to MongoDB Atlas: {str(e)}")
-            self._connected = False
-            raise
+            logger.warning(f"Could not convert legacy timestamps: {str(e)}")
+
+    async def _monitor_health(self):
+        """Ping the server periodically and update the is_connected flag; reconnection is left to the driver"""
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL_SECONDS)
+            if self.client is None:
+                continue
+            try:
+                await self.client.admin.command('ping')
+                self._connected = True
+            except Exception as e:
+                if self._connected:
+                    logger.warning(f"MongoDB health check failed: {str(e)}")
+                self._connected = False
 
     async def disconnect(self):
         """Disconnect from MongoDB Atlas"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._migration_task is not None:
+            self._migration_task.cancel()
+            self._migration_task = None
         if self.client:
             self.client.close()
+            self.client = None
+            self.database = None
+            self.collection = None
             self._connected = False
             logger.info("Disconnected from MongoDB Atlas")
 
     async def is_connected(self) -> bool:
-        """Check if connected to MongoDB"""
-        if not self._connected or not self.client:
-            return False
-        try:
-            await self.client.admin.command('ping')
-            return True
-        except Exception:
-            self._connected = False
-            return False
+        """Check if connected to MongoDB, as last observed by an operation or the health check"""
+        return self._connected and self.client is not None
 
+    @reconnect_on_failure(retry=False)
     async def insert_document(self, document: Document) -> str:
         """Insert a single document"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
             raise RuntimeError("MongoDB collection not initialized")
         
-        doc_dict = document.dict()
-        doc_dict['created_at'] = datetime.utcnow()
-        doc_dict['updated_at'] = datetime.utcnow()
+        now = now_ms()
+        doc_dict = {**document.model_dump(exclude_none=True), "created_at": now, "updated_at": now}
         
         result = await self.collection.insert_one(doc_dict)
         logger.info(f"Inserted document with ID: {result.inserted_id}")
         return str(result.inserted_id)
 
+    @reconnect_on_failure(retry=False)
     async def insert_documents(self, documents: List[Document]) -> List[str]:
         """Insert multiple documents"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
@@ -83,135 +240,104 @@ class MongoDBService:
         if not documents:
             return []
         
-        docs_dict = []
-        for doc in documents:
-            doc_dict = doc.dict()
-            doc_dict['created_at'] = datetime.utcnow()
-            doc_dict['updated_at'] = datetime.utcnow()
-            docs_dict.append(doc_dict)
-        
-        result = await self.collection.insert_many(docs_dict)
-        inserted_ids = [str(id) for id in result.inserted_ids]
+        now = now_ms()
+        docs_dict = [{**doc.model_dump(exclude_none=True), "created_at": now, "updated_at": now} for doc in documents]
+        
+        inserted_ids = []
+        for start in range(0, len(docs_dict), INSERT_BATCH_SIZE):
+            result = await self.collection.insert_many(
+                docs_dict[start:start + INSERT_BATCH_SIZE],
+                ordered=False,
+                bypass_document_validation=True
+            )
+            inserted_ids.extend(str(id) for id in result.inserted_ids)
         logger.info(f"Inserted {len(inserted_ids)} documents")
         return inserted_ids
 
-    async def search_documents(self, query: str, limit: int = 10, filter_dict: Optional[Dict[str, Any]] = None) -> List[Document]:
+    def _row_to_document(self, doc: Dict[str, Any]) -> Document:
+        """Build a Document from a trusted MongoDB row without running pydantic validation"""
+        doc['id'] = str(doc.pop('_id'))
+        for field in ('created_at', 'updated_at'):
+            if field in doc:
+                doc[field] = to_epoch_ms(doc[field])
+        return Document.model_construct(**doc)
+
+    def _document_projection(self, content_limit: Optional[int] = None) -> Dict[str, Any]:
+        """Projection of the Document fields, truncating content server-side when content_limit is set"""
+        return {
+            "content": 1 if content_limit is None else {"$substrCP": ["$content", 0, content_limit]},
+            "metadata": 1,
+            "created_at": 1,
+            "updated_at": 1
+        }
+
+    @reconnect_on_failure()
+    async def search_documents(self, query: str, limit: int = 10, filter_dict: Optional[Dict[str, Any]] = None, content_limit: Optional[int] = None) -> List[Document]:
         """Search documents using enhanced text search with context-aware relevance scoring"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
             raise RuntimeError("MongoDB collection not initialized")
         
-        documents = []
-        query_lower = query.lower()
-        
-        conceptual_filter = {
-            "$or": [
-                {"metadata.title": {"$regex": f"^{query}$", "$options": "i"}},
-                {"metadata.title": {"$regex": f"^what is {query}", "$options": "i"}},
-                {"content": {"$regex": f"\\b{query}\\b(?!\\s+(search|api|tool|function))", "$options": "i"}},
-            ]
-        }
-        if filter_dict:
-            conceptual_filter.update(filter_dict)
-        
-        conceptual_cursor = self.collection.find(conceptual_filter).limit(limit // 3)
-        conceptual_docs = []
-        async for doc in conceptual_cursor:
-            doc['id'] = str(doc.pop('_id'))
-            score = 15
-            if 'title' in doc.get('metadata', {}) and query_lower in doc['metadata']['title'].lower():
-                score += 5
-            doc['_search_score'] = score
-            conceptual_docs.append(Document(**doc))
-        
-        documents.extend(conceptual_docs)
-        remaining_limit = limit - len(conceptual_docs)
+        query = query.replace('"', '').strip()
+        projection = self._document_projection(content_limit)
         
-        if remaining_limit > 0:
-            search_filter = {"$text": {"$search": query}}
-            if filter_dict:
-                search_filter.update(filter_dict)
-            
-            cursor = self.collection.find(
-                search_filter,
-                {"score": {"$meta": "textScore"}}
-            ).sort([("score", {"$meta": "textScore"})]).limit(remaining_limit)
-            
-            conceptual_ids = {doc.id for doc in conceptual_docs}
+        if not query:
+            documents = []
+            cursor = self.collection.find(filter_dict or {}, projection).sort("created_at", -1).limit(limit)
             async for doc in cursor:
-                doc_id = str(doc.pop('_id'))
-                if doc_id not in conceptual_ids:
-                    doc['id'] = doc_id
-                    base_score = doc.pop('score', 1)
-                    
-                    content_lower = doc.get('content', '').lower()
-                    title_lower = doc.get('metadata', {}).get('title', '').lower()
-                    
-                    penalty = 0
-                    technical_phrases = [f"{query_lower} search", f"{query_lower} api", f"{query_lower} tool", 
-                                       f"{query_lower} function", f"search {query_lower}", f"using {query_lower}"]
-                    for phrase in technical_phrases:
-                        if phrase in content_lower or phrase in title_lower:
-                            penalty += 0.3
-                    
-                    bonus = 0
-                    conceptual_indicators = ["what is", "definition", "overview", "introduction", "about"]
-                    for indicator in conceptual_indicators:
-                        if indicator in content_lower or indicator in title_lower:
-                            bonus += 0.2
-                    
-                    final_score = max(0.1, base_score - penalty + bonus)
-                    doc['_search_score'] = final_score
-                    documents.append(Document(**doc))
-        
-        if len(documents) < limit // 2 and remaining_limit > 0:
-            keywords = [word for word in query_lower.split() if len(word) > 2]
-            keyword_filter = {
-                "$or": [
-                    {"content": {"$regex": keyword, "$options": "i"}} 
-                    for keyword in keywords
-                ]
-            }
-            if filter_dict:
-                keyword_filter.update(filter_dict)
-            
-            existing_ids = {doc.id for doc in documents}
-            fallback_cursor = self.collection.find(keyword_filter).limit(remaining_limit)
-            async for doc in fallback_cursor:
-                doc_id = str(doc.pop('_id'))
-                if doc_id not in existing_ids:
-                    doc['id'] = doc_id
-                    doc['_search_score'] = 0.3
-                    documents.append(Document(**doc))
+                documents.append(self._row_to_document(doc))
+            logger.info(f"Found {len(documents)} documents for filter-only search")
+            return documents
         
-        documents.sort(key=lambda x: getattr(x, '_search_score', 0), reverse=True)
+        search_filter = {"$text": {"$search": query}}
+        if filter_dict:
+            search_filter.update(filter_dict)
+        
+        # One indexed $text query fetches the candidates. Content patterns are matched
+        # on the server before the projection truncates content; scores are combined in Python
+        match_fields = _content_match_fields(query)
+        pipeline = [
+            {"$match": search_filter},
+            {"$addFields": {"_text_score": {"$meta": "textScore"}}},
+            {"$sort": {"_text_score": -1}},
+            {"$limit": limit * 3},
+            {"$addFields": match_fields},
+            {"$project": {**projection, "_text_score": 1, **{field: 1 for field in match_fields}}}
+        ]
+        
+        rows = await self.collection.aggregate(pipeline).to_list(length=None)
+        _score_search_rows(rows, query, limit)
+        documents = [self._row_to_document(doc) for doc in rows]
+        
+        documents.sort(key=lambda x: x.search_score or 0, reverse=True)
         
         logger.info(f"Found {len(documents)} documents for query: {query} using context-aware search")
         return documents[:limit]
 
-    async def get_all_documents(self, limit: int = 100) -> List[Document]:
+    @reconnect_on_failure()
+    async def get_all_documents(self, limit: int = 100, content_limit: Optional[int] = None) -> List[Document]:
         """Get all documents with optional limit"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
             raise RuntimeError("MongoDB collection not initialized")
         
-        cursor = self.collection.find().limit(limit).sort("created_at", -1)
+        rows = await self.collection.find({}, self._document_projection(content_limit)).sort("created_at", -1).limit(limit).to_list(length=limit)
         documents = []
         
-        async for doc in cursor:
-            doc['id'] = str(doc.pop('_id'))
-            documents.append(Document(**doc))
+        for doc in rows:
+            documents.append(self._row_to_document(doc))
         
         logger.info(f"Retrieved {len(documents)} documents")
         return documents
 
+    @reconnect_on_failure()
     async def delete_document(self, document_id: str) -> bool:
         """Delete a document by ID"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
@@ -226,9 +352,10 @@ class MongoDBService:
             logger.warning(f"Document not found for deletion: {document_id}")
         return success
 
+    @reconnect_on_failure()
     async def get_document_count(self) -> int:
         """Get total document count"""
-        if not await self.is_connected():
+        if self.client is None:
             await self.connect()
         
         if self.collection is None:
@@ -237,23 +364,18 @@ class MongoDBService:
         count = await self.collection.count_documents({})
         return count
 
-    async def search_documents_semantic(self, query: str, limit: int = 10, filter_dict: Optional[Dict[str, Any]] = None) -> List[Document]:
-        """Advanced semantic search with fuzzy matching and content analysis"""
-        if not await self.is_connected():
-            await self.connect()
-        
-        if self.collection is None:
-            raise RuntimeError("MongoDB collection not initialized")
-        
+    def _text_search_pipeline(self, query: str, filter_dict: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Semantic search stages built on $text and regex matching, scored with aggregation expressions"""
+        pattern = re.escape(query)
         pipeline = []
         
         match_stage = {
             "$match": {
                 "$or": [
                     {"$text": {"$search": query}},
-                    {"content": {"$regex": query, "$options": "i"}},
-                    {"metadata.title": {"$regex": query, "$options": "i"}},
-                    {"metadata.description": {"$regex": query, "$options": "i"}}
+                    {"content": {"$regex": pattern, "$options": "i"}},
+                    {"metadata.title": {"$regex": pattern, "$options": "i"}},
+                    {"metadata.description": {"$regex": pattern, "$options": "i"}}
                 ]
             }
         }
@@ -268,11 +390,11 @@ class MongoDBService:
                 "relevance_score": {
                     "$add": [
                         {"$cond": [{"$gt": [{"$meta": "textScore"}, 0]}, {"$meta": "textScore"}, 0]},
-                        {"$cond": [{"$regexMatch": {"input": "$metadata.title", "regex": query, "options": "i"}}, 5, 0]},
-                        {"$cond": [{"$regexMatch": {"input": "$metadata.title", "regex": f"^what is {query}", "options": "i"}}, 8, 0]},
+                        {"$cond": [{"$regexMatch": {"input": "$metadata.title", "regex": pattern, "options": "i"}}, 5, 0]},
+                        {"$cond": [{"$regexMatch": {"input": "$metadata.title", "regex": f"^what is {pattern}", "options": "i"}}, 8, 0]},
                         {"$cond": [{"$lt": [{"$strLenCP": "$content"}, 1000]}, 2, 0]},
-                        {"$cond": [{"$gt": ["$created_at", {"$dateSubtract": {"startDate": "$$NOW", "unit": "day", "amount": 30}}]}, 1, 0]},
-                        {"$cond": [{"$regexMatch": {"input": "$content", "regex": f"{query} (search|api|tool|function)", "options": "i"}}, -2, 0]},
+                        {"$cond": [{"$gt": [{"$toLong": "$created_at"}, {"$subtract": [{"$toLong": "$$NOW"}, RECENT_DOCUMENT_WINDOW_MS]}]}, 1, 0]},
+                        {"$cond": [{"$regexMatch": {"input": "$content", "regex": f"{pattern} (search|api|tool|function)", "options": "i"}}, -2, 0]},
                         {"$cond": [{"$regexMatch": {"input": "$content", "regex": "(what is|definition|overview|introduction)", "options": "i"}}, 3, 0]}
                     ]
                 }
@@ -281,13 +403,53 @@ class MongoDBService:
         
         pipeline.append({"$sort": {"relevance_score": -1, "created_at": -1}})
         
+        return pipeline
+
+    def _atlas_search_pipeline(self, query: str, filter_dict: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Semantic search stages built on an Atlas Search index, scored by Lucene"""
+        pipeline = [
+            {
+                "$search": {
+                    "index": settings.mongo_atlas_search_index,
+                    "compound": {
+                        "should": [
+                            {"text": {"query": query, "path": ["content", "metadata.title", "metadata.description"], "fuzzy": {"maxEdits": 1}}},
+                            {"phrase": {"query": f"what is {query}", "path": "metadata.title", "score": {"boost": {"value": 8}}}}
+                        ],
+                        "minimumShouldMatch": 1
+                    }
+                }
+            }
+        ]
+        
+        if filter_dict:
+            pipeline.append({"$match": filter_dict})
+        
+        pipeline.append({"$addFields": {"relevance_score": {"$meta": "searchScore"}}})
+        return pipeline
+
+    @reconnect_on_failure()
+    async def search_documents_semantic(self, query: str, limit: int = 10, filter_dict: Optional[Dict[str, Any]] = None, content_limit: Optional[int] = None) -> List[Document]:
+        """Advanced semantic search with fuzzy matching and content analysis"""
+        if self.client is None:
+            await self.connect()
+        
+        if self.collection is None:
+            raise RuntimeError("MongoDB collection not initialized")
+        
+        if settings.mongo_atlas_search_index:
+            pipeline = self._atlas_search_pipeline(query, filter_dict)
+        else:
+            pipeline = self._text_search_pipeline(query, filter_dict)
+        
         pipeline.append({"$limit": limit})
         
+        pipeline.append({"$project": {**self._document_projection(content_limit), "relevance_score": 1}})
+        
         documents = []
         async for doc in self.collection.aggregate(pipeline):
-            doc['id'] = str(doc.pop('_id'))
-            doc['_search_score'] = doc.pop('relevance_score', 1)
-            documents.append(Document(**doc))
+            doc['search_score'] = doc.pop('relevance_score', 1)
+            documents.append(self._row_to_document(doc))
         
         logger.info(f"Found {len(documents)} documents for semantic search query: {query}")
         return documents